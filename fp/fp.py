@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 
+import copy
 import random
+from itertools import islice
 
 import lxml.html as lh
 import requests
 
 from fp.errors import FreeProxyException
 
+# (connect, read) timeout in seconds for fetching the proxy list pages
+SCRAPE_TIMEOUT = (5, 15)
+
 
 class FreeProxy:
     '''
@@ -15,10 +20,11 @@ class FreeProxy:
     and <https://free-proxy-list.net> and checks if proxy is working. 
     There is possibility to filter proxies by country and acceptable timeout. 
     You can also randomize list of proxies from where script would get first 
-    working proxy.
+    working proxy. Pass a requests.Session to reuse its connections when
+    scraping the proxy list websites.
     '''
 
-    def __init__(self, country_id=None, timeout=0.5, rand=False, anonym=False, elite=False, google=None, https=False, url='https://www.google.com'):
+    def __init__(self, country_id=None, timeout=0.5, rand=False, anonym=False, elite=False, google=None, https=False, url='https://www.google.com', session=None):
         self.country_id = country_id
         self.timeout = timeout
         self.random = rand
@@ -27,18 +33,25 @@ class FreeProxy:
         self.google = google
         self.schema = 'https' if https else 'http'
         self.url = url
+        self.session = session
 
     def get_proxy_list(self, repeat):
+        return list(self.get_proxy_iter(repeat))
+
+    def get_proxy_iter(self, repeat):
+        '''Yields matching proxies one at a time, so callers can stop early.'''
+        http = self.session if self.session is not None else requests
         try:
-            page = requests.get(self.__website(repeat))
+            page = http.get(self.__website(repeat), timeout=SCRAPE_TIMEOUT)
             doc = lh.fromstring(page.content)
         except requests.exceptions.RequestException as e:
             raise FreeProxyException(
                 f'Request to {self.__website(repeat)} failed') from e
         try:
-            tr_elements = doc.xpath('//*[@id="list"]//tr')
-            return [f'{tr_elements[i][0].text_content()}:{tr_elements[i][1].text_content()}'
-                    for i in range(1, len(tr_elements)) if self.__criteria(tr_elements[i])]
+            # Skip the header row
+            for tr_element in islice(doc.iterfind('.//*[@id="list"]//tr'), 1, None):
+                if self.__criteria(tr_element):
+                    yield f'{tr_element[0].text_content()}:{tr_element[1].text_content()}'
         except Exception as e:
             raise FreeProxyException('Failed to get list of proxies') from e
 
@@ -68,9 +81,11 @@ class FreeProxy:
 
     def get(self, repeat=False):
         '''Returns a working proxy that matches the specified parameters.'''
-        proxy_list = self.get_proxy_list(repeat)
         if self.random:
+            proxy_list = self.get_proxy_list(repeat)
             random.shuffle(proxy_list)
+        else:
+            proxy_list = self.get_proxy_iter(repeat)
         working_proxy = None
         for proxy_address in proxy_list:
             proxies = {self.schema: f'http://{proxy_address}'}
@@ -81,9 +96,10 @@ class FreeProxy:
             except requests.exceptions.RequestException:
                 continue
         if not working_proxy and not repeat:
-            if self.country_id is not None:
-                self.country_id = None
-            return self.get(repeat=True)
+            # Retry without the country filter on a copy so this instance stays reusable
+            fallback = copy.copy(self)
+            fallback.country_id = None
+            return fallback.get(repeat=True)
         raise FreeProxyException(
             'There are no working proxies at this time.')
 
@@ -1,28 +1,334 @@
 #!/usr/bin/env python3
 
-from typing import Optional, List
-from fastapi import FastAPI, HTTPException, Query
-from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from itertools import islice
+from random import sample
+from typing import Annotated, Any, Awaitable, Callable, Dict, Optional, List, Tuple
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import asyncio
+import gzip
+import hashlib
+import httpx
 import logging
+import math
+import orjson
+import os
+import requests
 
 from fp.fp import FreeProxy
 from fp.errors import FreeProxyException
 
 # Logging setup
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
 logger = logging.getLogger(__name__)
+# httpx logs every request at INFO, which would mean a line per proxy probe
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Cache settings; caching, proxy pools and rate limiting are disabled when REDIS_URL is unset
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "0.5"))
+CACHE_PREFIX = "proxy-api"
+PROXY_CACHE_TTL = int(os.getenv("PROXY_CACHE_TTL", "15"))
+PROXY_LIST_CACHE_TTL = int(os.getenv("PROXY_LIST_CACHE_TTL", "30"))
+STALE_CACHE_TTL = int(os.getenv("STALE_CACHE_TTL", "600"))
+
+# Proxy pool settings
+POOL_REFRESH_INTERVAL = int(os.getenv("POOL_REFRESH_INTERVAL", "60"))
+# Filter combinations (country, anonymous, elite, https, google) kept warm by the refresh task
+POOL_FILTERS = [
+    (None, False, False, False, None),
+    ("US", False, False, False, None),
+    ("GB", False, False, False, None),
+    (None, False, True, False, None),
+    (None, False, False, True, None),
+]
+
+# Max concurrent blocking FreeProxy calls (scrapes and validations)
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", "32"))
+
+# Per-client rate limit for the proxy endpoints (token bucket); RATE_LIMIT=0 disables it
+RATE_LIMIT = float(os.getenv("RATE_LIMIT", "10"))  # requests per second
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "20"))
+
+# Proxy validation settings for /proxies
+VALIDATION_URL = "www.google.com"
+VALIDATION_CONCURRENCY = int(os.getenv("VALIDATION_CONCURRENCY", "200"))
+# How many candidates are probed per requested proxy
+VALIDATION_OVERSAMPLE = 3
+
+# Short socket timeouts so an unreachable Redis costs a request milliseconds, not a TCP timeout
+redis_client = aioredis.from_url(
+    REDIS_URL, socket_connect_timeout=REDIS_TIMEOUT, socket_timeout=REDIS_TIMEOUT
+) if REDIS_URL else None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if redis_client is None:
+        logger.warning("REDIS_URL is not set: caching, proxy pools and rate limiting are disabled")
+        yield
+    else:
+        refresh_task = asyncio.create_task(_refresh_pools_loop())
+        yield
+        refresh_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await refresh_task
+        await redis_client.aclose()
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _session.close()
+
 
 app = FastAPI(
     title="Proxy Manager API",
     description="REST API for getting free working proxies with various filtering options",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
+# Proxy lists and the root document are repetitive JSON that compresses several times over
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
+
+
+# FreeProxy is synchronous (requests-based), so its calls run in a dedicated thread pool
+# to keep the event loop free. The semaphore makes excess calls wait in the event loop,
+# where they can still be cancelled, rather than in the executor's unbounded queue.
+_executor = ThreadPoolExecutor(max_workers=UPSTREAM_CONCURRENCY, thread_name_prefix="freeproxy")
+_upstream_semaphore = asyncio.Semaphore(UPSTREAM_CONCURRENCY)
+
+
+# Keep-alive session shared by every FreeProxy instance for scraping the proxy list sites,
+# so scrapes reuse pooled TCP/TLS connections instead of handshaking each time
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=4,  # one pool per proxy list site
+    pool_maxsize=UPSTREAM_CONCURRENCY,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504))
+))
+
+
+async def _run_blocking(func: Callable[..., Any], *args) -> Any:
+    async with _upstream_semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, partial(func, *args))
+
+
+# Async proxy validation
+# Built once: creating an SSL context per probe client is far more expensive than the probe setup
+_ssl_context = httpx.create_ssl_context()
+_validation_semaphore = asyncio.Semaphore(VALIDATION_CONCURRENCY)
+
+
+async def _check_proxy(proxy: str, schema: str, timeout: float) -> Optional[str]:
+    """Return proxy if a request through it gets a non-error answer within timeout, otherwise None"""
+    async with _validation_semaphore:
+        try:
+            # httpx binds proxies per client, so each probe gets its own short-lived client
+            async with httpx.AsyncClient(proxies=f"http://{proxy}", timeout=timeout, verify=_ssl_context) as client:
+                async with client.stream("GET", f"{schema}://{VALIDATION_URL}") as response:
+                    # Proxies that refuse to forward often answer 403/407 themselves
+                    return proxy if response.status_code < 400 else None
+        except Exception:
+            # Any failure means "not working": besides httpx errors, malformed scraped entries
+            # raise e.g. InvalidURL (non-numeric port) or a bare OverflowError (port > 65535)
+            return None
+
+
+async def _validate_proxies(proxies: List[str], schema: str, timeout: float) -> List[str]:
+    """Probe all proxies concurrently and return the working ones in their original order"""
+    results = await asyncio.gather(*(_check_proxy(proxy, schema, timeout) for proxy in proxies))
+    return [proxy for proxy in results if proxy]
+
+
+# Response cache helpers
+# Upstream fetches in progress, keyed by cache key
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def _cache_key(namespace: str, *filters) -> str:
+    """Build a Redis key unique to the endpoint namespace and filter combination"""
+    digest = hashlib.blake2b(repr(filters).encode(), digest_size=16).hexdigest()
+    return f"{CACHE_PREFIX}:{namespace}:{digest}"
+
+
+# Set while Redis is failing, so an outage is logged once rather than on every request
+_redis_down = False
+
+
+def _redis_failed(e: RedisError) -> None:
+    global _redis_down
+    if not _redis_down:
+        logger.warning("Redis unavailable, continuing without it: %s", e)
+        _redis_down = True
+
+
+def _redis_ok() -> None:
+    global _redis_down
+    if _redis_down:
+        logger.info("Redis connection restored")
+        _redis_down = False
+
+
+async def _cache_get(key: str) -> Any:
+    if redis_client is None:
+        return None
+    try:
+        value = await redis_client.get(key)
+    except RedisError as e:
+        _redis_failed(e)
+        return None
+    _redis_ok()
+    return orjson.loads(value) if value is not None else None
+
+
+async def _cache_set(value: Any, entries: List[Tuple[str, int]]) -> None:
+    """Store value under every (key, expire) pair in a single round trip"""
+    if redis_client is None:
+        return
+    payload = orjson.dumps(value)
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key, expire in entries:
+                pipe.set(key, payload, ex=expire)
+            await pipe.execute()
+    except RedisError as e:
+        _redis_failed(e)
+        return
+    _redis_ok()
+
+
+async def _fetch_and_store(key: str, expire: int, fetch: Callable[[], Awaitable[Any]], bypass: bool) -> Tuple[Any, str]:
+    stale_key = f"stale:{key}"
+    try:
+        value = await fetch()
+    except FreeProxyException as e:
+        value = await _cache_get(stale_key)
+        if value is None:
+            raise
+        logger.warning("Serving stale cache entry: %s", e)
+        return value, "STALE"
+
+    entries = [(stale_key, STALE_CACHE_TTL)]
+    if not bypass:
+        entries.append((key, expire))
+    await _cache_set(value, entries)
+    return value, "MISS"
+
+
+async def _single_flight(key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """Run fetch once for all concurrent callers with the same key and share its result"""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shielded so one client disconnecting doesn't cancel the fetch others are waiting on
+    return await asyncio.shield(task)
+
+
+async def _cached(key: str, expire: int, fetch: Callable[[], Awaitable[Any]], bypass: bool = False) -> Tuple[Any, str]:
+    """
+    Return the value cached under key and its cache status (HIT, MISS or STALE).
+
+    On a miss fetch is awaited and its result cached. Concurrent misses for the same key
+    share a single fetch. Every fresh result is also kept under stale:<key> for
+    STALE_CACHE_TTL seconds and served instead of failing when fetch raises
+    FreeProxyException, so short upstream outages don't surface as 503.
+
+    Redis errors are logged and treated as a miss so the API keeps working without a cache.
+    With bypass set the fresh cache is neither read nor written and fetches aren't shared
+    (used for random=true requests).
+    """
+    if bypass:
+        return await _fetch_and_store(key, expire, fetch, bypass)
+
+    value = await _cache_get(key)
+    if value is not None:
+        return value, "HIT"
+    return await _single_flight(key, lambda: _fetch_and_store(key, expire, fetch, bypass))
+
+
+# Proxy pool
+_pool_locks = {filters: asyncio.Lock() for filters in POOL_FILTERS}
+
+
+async def _refresh_pool(filters: tuple) -> None:
+    country, anonymous, elite, https, google = filters
+    proxy_handler = FreeProxy(
+        country_id=[country] if country else None,
+        anonym=anonymous,
+        elite=elite,
+        google=google,
+        https=https,
+        session=_session
+    )
+
+    async with _pool_locks[filters]:
+        try:
+            proxy_list = await _run_blocking(proxy_handler.get_proxy_list, False)
+        except FreeProxyException as e:
+            logger.warning("Failed to refresh proxy pool %s: %s", filters, e)
+            return
+        # Outlive a few refresh cycles, but expire if the refresh task stops
+        await _cache_set(proxy_list, [(_cache_key("pool", *filters), POOL_REFRESH_INTERVAL * 3)])
+
+
+async def _acquire_refresh_lease() -> bool:
+    """Let only one worker process refresh the shared pools per interval"""
+    try:
+        acquired = await redis_client.set(
+            f"{CACHE_PREFIX}:pool-refresh", os.getpid(), nx=True, ex=POOL_REFRESH_INTERVAL
+        )
+    except RedisError as e:
+        # Without Redis the pools can't be stored anyway, so scraping would be wasted
+        _redis_failed(e)
+        return False
+    _redis_ok()
+    return bool(acquired)
+
+
+async def _refresh_pools_loop() -> None:
+    """Re-scrape every pooled filter combination each POOL_REFRESH_INTERVAL seconds"""
+    while True:
+        if await _acquire_refresh_lease():
+            for filters in POOL_FILTERS:
+                try:
+                    await _refresh_pool(filters)
+                except Exception as e:
+                    logger.error("Unexpected error refreshing proxy pool: %s", e, exc_info=True)
+        await asyncio.sleep(POOL_REFRESH_INTERVAL)
+
+
+async def _read_pool(*filters) -> Optional[List[str]]:
+    """Return the pre-scraped proxy list for filters, or None if it isn't pooled or not ready"""
+    lock = _pool_locks.get(filters)
+    if lock is None:
+        return None
+
+    key = _cache_key("pool", *filters)
+    pool = await _cache_get(key)
+    if pool is None and lock.locked():
+        # A refresh is in flight (e.g. right after startup): wait for it instead of scraping too
+        async with lock:
+            pass
+        pool = await _cache_get(key)
+    return pool
 
 
 # Pydantic models
 class ProxyResponse(BaseModel):
     proxy: str
-    schema: str
+    # "schema" would shadow BaseModel.schema(), so the field is only exposed under that alias
+    schema_: str = Field(alias="schema")
     country: Optional[str] = None
 
 
@@ -39,23 +345,131 @@ class ProxyConfigResponse(BaseModel):
 
 
 # Health check endpoint
+_HEALTH_JSON = orjson.dumps({"status": "ok"})
+
+
 @app.get("/health", tags=["Health"])
 async def health_check():
     """Check if the service is running"""
-    return {"status": "ok"}
+    return Response(content=_HEALTH_JSON, media_type="application/json")
+
+
+# Rate limiting
+# Refills the bucket for the elapsed time, then takes one token. Runs atomically in Redis,
+# so the limit holds across worker processes. Returns {allowed, retry_after_seconds}.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+_token_bucket = redis_client.register_script(_TOKEN_BUCKET_SCRIPT) if redis_client is not None else None
+
+
+async def rate_limit(request: Request) -> None:
+    """Reject clients over their request budget before any cache or upstream work"""
+    if RATE_LIMIT <= 0 or _token_bucket is None or request.client is None:
+        return
+
+    key = f"{CACHE_PREFIX}:ratelimit:{request.client.host}"
+    try:
+        allowed, retry_after = await _token_bucket(keys=[key], args=[RATE_LIMIT, RATE_LIMIT_BURST])
+    except RedisError as e:
+        # Fail open: an unavailable limiter shouldn't take the API down with it
+        _redis_failed(e)
+        return
+    _redis_ok()
+
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(float(retry_after)))}
+        )
+
+
+# Request filters
+# ISO 3166-1 alpha-2 codes, used to reject unknown countries before any upstream work
+_VALID_COUNTRY_CODES = frozenset("""
+    AD AE AF AG AI AL AM AO AQ AR AS AT AU AW AX AZ BA BB BD BE BF BG BH BI BJ BL BM BN BO BQ BR BS BT BV BW BY BZ
+    CA CC CD CF CG CH CI CK CL CM CN CO CR CU CV CW CX CY CZ DE DJ DK DM DO DZ EC EE EG EH ER ES ET FI FJ FK FM FO FR
+    GA GB GD GE GF GG GH GI GL GM GN GP GQ GR GS GT GU GW GY HK HM HN HR HT HU ID IE IL IM IN IO IQ IR IS IT JE JM JO JP
+    KE KG KH KI KM KN KP KR KW KY KZ LA LB LC LI LK LR LS LT LU LV LY MA MC MD ME MF MG MH MK ML MM MN MO MP MQ MR MS MT
+    MU MV MW MX MY MZ NA NC NE NF NG NI NL NO NP NR NU NZ OM PA PE PF PG PH PK PL PM PN PR PS PT PW PY QA RE RO RS RU RW
+    SA SB SC SD SE SG SH SI SJ SK SL SM SN SO SR SS ST SV SX SY SZ TC TD TF TG TH TJ TK TL TM TN TO TR TT TV TW TZ UA UG
+    UM US UY UZ VA VC VE VG VI VN VU WF WS YE YT ZA ZM ZW
+""".split())
+
+
+@dataclass(frozen=True, slots=True)
+class ProxyFilters:
+    country: Optional[str] = None
+    timeout: float = 1.0
+    random: bool = False
+    anonymous: bool = False
+    elite: bool = False
+    https: bool = False
+    google: Optional[bool] = None
+
+    @property
+    def schema(self) -> str:
+        return 'https' if self.https else 'http'
+
+
+async def proxy_filters(
+    country: Annotated[Optional[str], Query(description="Country code (e.g., 'US', 'GB', 'BR')")] = None,
+    timeout: Annotated[float, Query(gt=0, description="Timeout for proxy validation in seconds (default: 1.0s)")] = 1.0,
+    random: Annotated[bool, Query(description="Randomize proxy selection")] = False,
+    anonymous: Annotated[bool, Query(description="Only return anonymous proxies")] = False,
+    elite: Annotated[bool, Query(description="Only return elite proxies")] = False,
+    https: Annotated[bool, Query(description="Only return HTTPS proxies")] = False,
+    google: Annotated[Optional[bool], Query(description="Filter by Google compatibility")] = None
+) -> ProxyFilters:
+    """Query filters shared by all proxy endpoints (async so FastAPI doesn't run it in a threadpool)"""
+    if country:
+        # Normalized once so 'us' and 'US' share cache entries and pools
+        country = country.upper()
+        if country not in _VALID_COUNTRY_CODES:
+            raise HTTPException(status_code=400, detail=f"Invalid country code: {country}")
+    return ProxyFilters(country, timeout, random, anonymous, elite, https, google)
+
+
+Filters = Annotated[ProxyFilters, Depends(proxy_filters)]
+
+
+@lru_cache(maxsize=128)
+def _make_handler(filters: ProxyFilters) -> FreeProxy:
+    """Return a FreeProxy for filters, reused across requests (FreeProxy keeps no per-call state)"""
+    return FreeProxy(
+        country_id=[filters.country] if filters.country else None,
+        timeout=filters.timeout,
+        rand=filters.random,
+        anonym=filters.anonymous,
+        elite=filters.elite,
+        google=filters.google,
+        https=filters.https,
+        session=_session
+    )
 
 
 # Get single proxy endpoint
-@app.get("/proxy", response_model=ProxyResponse, tags=["Proxy"])
-async def get_proxy(
-    country: Optional[str] = Query(None, description="Country code (e.g., 'US', 'GB', 'BR')"),
-    timeout: float = Query(1.0, gt=0, description="Timeout for proxy validation in seconds (default: 1.0s)"),
-    random: bool = Query(False, description="Randomize proxy selection"),
-    anonymous: bool = Query(False, description="Only return anonymous proxies"),
-    elite: bool = Query(False, description="Only return elite proxies"),
-    https: bool = Query(False, description="Only return HTTPS proxies"),
-    google: Optional[bool] = Query(None, description="Filter by Google compatibility")
-):
+@app.get("/proxy", response_model=ProxyResponse, tags=["Proxy"], dependencies=[Depends(rate_limit)])
+async def get_proxy(response: Response, filters: Filters):
     """
     Get a single working proxy with specified filters.
 
@@ -69,45 +483,30 @@ async def get_proxy(
     - **google**: Filter by Google compatibility
     """
     try:
-        country_list = [country] if country else None
-
-        proxy_handler = FreeProxy(
-            country_id=country_list,
-            timeout=timeout,
-            rand=random,
-            anonym=anonymous,
-            elite=elite,
-            google=google,
-            https=https
-        )
+        proxy_handler = _make_handler(filters)
 
-        proxy_url = proxy_handler.get()
-        schema = 'https' if https else 'http'
+        key = _cache_key("proxy", filters)
+        proxy_url, cache_status = await _cached(
+            key, PROXY_CACHE_TTL, lambda: _run_blocking(proxy_handler.get), bypass=filters.random
+        )
+        response.headers["X-Cache"] = cache_status
 
         return ProxyResponse(
             proxy=proxy_url,
-            schema=schema,
-            country=country
+            schema=filters.schema,
+            country=filters.country
         )
     except FreeProxyException as e:
-        logger.error(f"Failed to get proxy: {str(e)}")
+        logger.warning("Failed to get proxy: %s", e)
         raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 # Get proxy configuration endpoint
-@app.get("/proxy/config", response_model=ProxyConfigResponse, tags=["Proxy"])
-async def get_proxy_config(
-    country: Optional[str] = Query(None, description="Country code (e.g., 'US', 'GB')"),
-    timeout: float = Query(1.0, gt=0, description="Timeout for proxy validation in seconds (default: 1.0s)"),
-    random: bool = Query(False, description="Randomize proxy selection"),
-    anonymous: bool = Query(False, description="Only return anonymous proxies"),
-    elite: bool = Query(False, description="Only return elite proxies"),
-    https: bool = Query(False, description="Only return HTTPS proxies"),
-    google: Optional[bool] = Query(None, description="Filter by Google compatibility")
-):
+@app.get("/proxy/config", response_model=ProxyConfigResponse, tags=["Proxy"], dependencies=[Depends(rate_limit)])
+async def get_proxy_config(filters: Filters):
     """
     Get a single working proxy as formatted configuration objects for different libraries.
 
@@ -116,47 +515,51 @@ async def get_proxy_config(
     - Playwright (JavaScript)
     """
     try:
-        country_list = [country] if country else None
-        schema = 'https' if https else 'http'
-
-        proxy_handler = FreeProxy(
-            country_id=country_list,
-            timeout=timeout,
-            rand=random,
-            anonym=anonymous,
-            elite=elite,
-            google=google,
-            https=https
-        )
+        proxy_handler = _make_handler(filters)
 
-        proxy_url = proxy_handler.get()
+        key = _cache_key("proxy", filters)
+        proxy_url, cache_status = await _cached(
+            key, PROXY_CACHE_TTL, lambda: _run_blocking(proxy_handler.get), bypass=filters.random
+        )
 
         # proxy_url comes as 'http://IP:PORT' so we use it directly for requests
-        # For Playwright, use the same format
-        return ProxyConfigResponse(
-            proxy_url=proxy_url,
-            requests={schema: proxy_url},
-            playwright={'server': proxy_url}
+        # For Playwright, use the same format. ProxyConfigResponse only documents the
+        # shape: the plain dict goes straight to orjson without model validation.
+        return ORJSONResponse(
+            {"proxy_url": proxy_url, "requests": {filters.schema: proxy_url}, "playwright": {"server": proxy_url}},
+            headers={"X-Cache": cache_status}
         )
     except FreeProxyException as e:
-        logger.error(f"Failed to get proxy config: {str(e)}")
+        logger.warning("Failed to get proxy config: %s", e)
         raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 # Get proxy list endpoint
-@app.get("/proxies", response_model=ProxyListResponse, tags=["Proxy"])
+def _etag(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag (RFC 7232)"""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip() == "*" or tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+@app.get(
+    "/proxies",
+    tags=["Proxy"],
+    responses={200: {"model": ProxyListResponse}},
+    dependencies=[Depends(rate_limit)]
+)
 async def get_proxy_list(
-    country: Optional[str] = Query(None, description="Country code (e.g., 'US', 'GB')"),
-    timeout: float = Query(1.0, gt=0, description="Timeout for proxy validation in seconds (default: 1.0s)"),
-    random: bool = Query(False, description="Randomize proxy selection"),
-    anonymous: bool = Query(False, description="Only return anonymous proxies"),
-    elite: bool = Query(False, description="Only return elite proxies"),
-    https: bool = Query(False, description="Only return HTTPS proxies"),
-    google: Optional[bool] = Query(None, description="Filter by Google compatibility"),
-    limit: int = Query(10, ge=1, le=100, description="Maximum number of proxies to return")
+    request: Request,
+    filters: Filters,
+    limit: Annotated[int, Query(ge=1, le=100, description="Maximum number of proxies to return")] = 10
 ):
     """
     Get a list of working proxies with specified filters.
@@ -165,121 +568,155 @@ async def get_proxy_list(
     this may take longer as each proxy needs to be validated.
     """
     try:
-        country_list = [country] if country else None
-
-        proxy_handler = FreeProxy(
-            country_id=country_list,
-            timeout=timeout,
-            rand=random,
-            anonym=anonymous,
-            elite=elite,
-            google=google,
-            https=https
+        proxy_handler = _make_handler(filters)
+
+        async def fetch_proxies():
+            # Common filter combinations come from the pre-scraped pool, the rest are scraped now
+            proxy_list = await _read_pool(filters.country, filters.anonymous, filters.elite, filters.https, filters.google)
+            if proxy_list is None and filters.random:
+                proxy_list = await _run_blocking(proxy_handler.get_proxy_list, False)
+            elif proxy_list is None:
+                # Stop filtering rows once enough candidates are found (the page is still parsed in full)
+                proxy_iter = islice(proxy_handler.get_proxy_iter(False), limit * VALIDATION_OVERSAMPLE)
+                proxy_list = await _run_blocking(list, proxy_iter)
+
+            candidate_count = min(limit * VALIDATION_OVERSAMPLE, len(proxy_list))
+            candidates = sample(proxy_list, candidate_count) if filters.random else proxy_list[:candidate_count]
+
+            # Validate candidates in parallel and limit results
+            limited_proxies = (await _validate_proxies(candidates, filters.schema, filters.timeout))[:limit]
+
+            if not limited_proxies:
+                raise FreeProxyException("No working proxies found matching the criteria")
+            return limited_proxies
+
+        key = _cache_key("proxies", filters, limit)
+        limited_proxies, cache_status = await _cached(
+            key, PROXY_LIST_CACHE_TTL, fetch_proxies, bypass=filters.random
         )
 
-        # Get proxy list without validation
-        proxy_list = proxy_handler.get_proxy_list(repeat=False)
-
-        # Limit results
-        limited_proxies = proxy_list[:limit]
-
-        if not limited_proxies:
-            raise FreeProxyException("No proxies found matching the criteria")
-
-        return ProxyListResponse(
-            proxies=limited_proxies,
-            count=len(limited_proxies),
-            country=country
-        )
+        # Plain dict straight to orjson: no ProxyListResponse construction or re-validation
+        body = orjson.dumps({"proxies": limited_proxies, "count": len(limited_proxies), "country": filters.country})
+        headers = {
+            "ETag": _etag(body),
+            "Cache-Control": "no-cache" if filters.random else f"max-age={PROXY_LIST_CACHE_TTL}",
+            "X-Cache": cache_status
+        }
+        # Polling clients that already have this list get an empty 304 instead of the body
+        if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
     except FreeProxyException as e:
-        logger.error(f"Failed to get proxy list: {str(e)}")
+        logger.warning("Failed to get proxy list: %s", e)
         raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 # Root endpoint
-@app.get("/", tags=["Info"])
-async def root():
-    """API documentation and info"""
-    return {
-        "name": "Proxy Manager API",
-        "version": "1.0.0",
-        "description": "Free proxy service with filtering capabilities",
-        "docs": "/docs",
-        "endpoints": {
-            "health": {
-                "method": "GET",
-                "path": "/health",
-                "description": "Check service health status"
-            },
-            "get_single_proxy": {
-                "method": "GET",
-                "path": "/proxy",
-                "description": "Get a single working proxy",
-                "parameters": {
-                    "country": "Country code (e.g., 'US', 'GB', 'BR')",
-                    "timeout": "Proxy validation timeout in seconds (default: 1.0)",
-                    "random": "Randomize selection (default: false)",
-                    "anonymous": "Only anonymous proxies (default: false)",
-                    "elite": "Only elite proxies (default: false)",
-                    "https": "Only HTTPS proxies (default: false)",
-                    "google": "Filter by Google compatibility (default: null)"
-                },
-                "example": "/proxy?country=US&elite=true"
+_ROOT_BODY = {
+    "name": "Proxy Manager API",
+    "version": "1.0.0",
+    "description": "Free proxy service with filtering capabilities",
+    "docs": "/docs",
+    "endpoints": {
+        "health": {
+            "method": "GET",
+            "path": "/health",
+            "description": "Check service health status"
+        },
+        "get_single_proxy": {
+            "method": "GET",
+            "path": "/proxy",
+            "description": "Get a single working proxy",
+            "parameters": {
+                "country": "Country code (e.g., 'US', 'GB', 'BR')",
+                "timeout": "Proxy validation timeout in seconds (default: 1.0)",
+                "random": "Randomize selection (default: false)",
+                "anonymous": "Only anonymous proxies (default: false)",
+                "elite": "Only elite proxies (default: false)",
+                "https": "Only HTTPS proxies (default: false)",
+                "google": "Filter by Google compatibility (default: null)"
             },
-            "get_proxy_config": {
-                "method": "GET",
-                "path": "/proxy/config",
-                "description": "Get proxy in requests/playwright formats",
-                "parameters": {
-                    "country": "Country code (e.g., 'US', 'GB', 'BR')",
-                    "timeout": "Proxy validation timeout in seconds (default: 1.0)",
-                    "random": "Randomize selection (default: false)",
-                    "anonymous": "Only anonymous proxies (default: false)",
-                    "elite": "Only elite proxies (default: false)",
-                    "https": "Only HTTPS proxies (default: false)",
-                    "google": "Filter by Google compatibility (default: null)"
-                },
-                "example": "/proxy/config?country=US",
-                "response_example": {
-                    "proxy_url": "113.160.218.14:8888",
-                    "requests": {"http": "http://113.160.218.14:8888"},
-                    "playwright": {"server": "http://113.160.218.14:8888"}
-                }
+            "example": "/proxy?country=US&elite=true"
+        },
+        "get_proxy_config": {
+            "method": "GET",
+            "path": "/proxy/config",
+            "description": "Get proxy in requests/playwright formats",
+            "parameters": {
+                "country": "Country code (e.g., 'US', 'GB', 'BR')",
+                "timeout": "Proxy validation timeout in seconds (default: 1.0)",
+                "random": "Randomize selection (default: false)",
+                "anonymous": "Only anonymous proxies (default: false)",
+                "elite": "Only elite proxies (default: false)",
+                "https": "Only HTTPS proxies (default: false)",
+                "google": "Filter by Google compatibility (default: null)"
             },
-            "get_proxy_list": {
-                "method": "GET",
-                "path": "/proxies",
-                "description": "Get a list of working proxies",
-                "parameters": {
-                    "country": "Country code (e.g., 'US', 'GB')",
-                    "timeout": "Proxy validation timeout in seconds (default: 1.0)",
-                    "random": "Randomize selection (default: false)",
-                    "anonymous": "Only anonymous proxies (default: false)",
-                    "elite": "Only elite proxies (default: false)",
-                    "https": "Only HTTPS proxies (default: false)",
-                    "google": "Filter by Google compatibility (default: null)",
-                    "limit": "Max results to return (1-100, default: 10)"
-                },
-                "example": "/proxies?country=US&elite=true&limit=5"
+            "example": "/proxy/config?country=US",
+            "response_example": {
+                "proxy_url": "113.160.218.14:8888",
+                "requests": {"http": "http://113.160.218.14:8888"},
+                "playwright": {"server": "http://113.160.218.14:8888"}
             }
         },
-        "common_filters": {
-            "web_scraping": "?elite=true&anonymous=true&timeout=1.0",
-            "fast_operations": "?timeout=0.3&random=true",
-            "privacy_sensitive": "?elite=true&anonymous=true&https=true",
-            "us_traffic": "?country=US&elite=true&google=true"
-        },
-        "usage_examples": {
-            "python_requests": "requests.get(url, proxies=requests_config)",
-            "javascript_playwright": "browser.newContext({ proxy: playwright_config })",
-            "curl": "curl 'http://localhost:8000/proxy?country=US'"
+        "get_proxy_list": {
+            "method": "GET",
+            "path": "/proxies",
+            "description": "Get a list of working proxies",
+            "parameters": {
+                "country": "Country code (e.g., 'US', 'GB')",
+                "timeout": "Proxy validation timeout in seconds (default: 1.0)",
+                "random": "Randomize selection (default: false)",
+                "anonymous": "Only anonymous proxies (default: false)",
+                "elite": "Only elite proxies (default: false)",
+                "https": "Only HTTPS proxies (default: false)",
+                "google": "Filter by Google compatibility (default: null)",
+                "limit": "Max results to return (1-100, default: 10)"
+            },
+            "example": "/proxies?country=US&elite=true&limit=5"
         }
+    },
+    "common_filters": {
+        "web_scraping": "?elite=true&anonymous=true&timeout=1.0",
+        "fast_operations": "?timeout=0.3&random=true",
+        "privacy_sensitive": "?elite=true&anonymous=true&https=true",
+        "us_traffic": "?country=US&elite=true&google=true"
+    },
+    "usage_examples": {
+        "python_requests": "requests.get(url, proxies=requests_config)",
+        "javascript_playwright": "browser.newContext({ proxy: playwright_config })",
+        "curl": "curl 'http://localhost:8000/proxy?country=US'"
     }
+}
+
+# Static, so it's encoded and compressed once at import instead of on every request
+_ROOT_JSON = orjson.dumps(_ROOT_BODY)
+_ROOT_GZIP = gzip.compress(_ROOT_JSON)
+
+
+@app.get("/", tags=["Info"])
+async def root(request: Request):
+    """API documentation and info"""
+    # GZipMiddleware passes responses that already have a Content-Encoding through untouched
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(
+            content=_ROOT_GZIP,
+            media_type="application/json",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+        )
+    return Response(content=_ROOT_JSON, media_type="application/json", headers={"Vary": "Accept-Encoding"})
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        access_log=False
+    )